@@ -1,4 +1,11 @@
-import os, sys, json, uuid
+import os, sys, re, io, json, time, uuid, hashlib, atexit, signal, select, socket, argparse, threading
+from collections import namedtuple, OrderedDict
+from functools import wraps
+from itertools import islice
+from concurrent.futures import ThreadPoolExecutor
+from http.server import HTTPServer, BaseHTTPRequestHandler
+from urllib.parse import unquote
+from types import MappingProxyType
 from django.conf import settings
 from django.core.management import execute_from_command_line
 from django.http import HttpResponse, JsonResponse
@@ -40,19 +47,23 @@ def load_data():
         'VOTE_COUNT': {str(i): 0 for i in range(1, 6)},
         'VOTERS': {str(i): [] for i in range(1, 6)},
         'SURVEY_RESPONSES': [],
+        'SURVEY_USERS': [],
         'VALID_TOKENS': {}
     }
 
 def save_data():
-    """Save data to file - PERMANENT STORAGE!"""
+    """Save data to file - PERMANENT STORAGE! Call with STATE_LOCK held"""
     data = {
         'VOTE_COUNT': {str(k): v for k, v in VOTE_COUNT.items()},
         'VOTERS': {str(k): v for k, v in VOTERS.items()},
         'SURVEY_RESPONSES': SURVEY_RESPONSES,
+        'SURVEY_USERS': SURVEY_USERS,
         'VALID_TOKENS': VALID_TOKENS
     }
-    with open(DATA_FILE, 'w') as f:
+    tmp = DATA_FILE + '.tmp'
+    with open(tmp, 'w') as f:
         json.dump(data, f, indent=2)
+    os.replace(tmp, DATA_FILE)
     print(f"💾 Saved! Total votes: {sum(VOTE_COUNT.values())}")
 
 # Load existing data
@@ -68,7 +79,11 @@ CANDIDATES = {
 
 VOTE_COUNT = {int(k): v for k, v in saved_data.get('VOTE_COUNT', {}).items()}
 VOTERS = {int(k): v for k, v in saved_data.get('VOTERS', {}).items()}
+VOTER_SETS = {k: set(v) for k, v in VOTERS.items()}
 SURVEY_RESPONSES = saved_data.get('SURVEY_RESPONSES', [])
+# Who submitted each survey, index-aligned with SURVEY_RESPONSES (None for surveys saved before this was tracked)
+SURVEY_USERS = saved_data.get('SURVEY_USERS', [])
+SURVEY_USERS += [None] * (len(SURVEY_RESPONSES) - len(SURVEY_USERS))
 CURRENT_USER = None
 VALID_TOKENS = saved_data.get('VALID_TOKENS', {})
 
@@ -86,23 +101,422 @@ SURVEY_QUESTIONS = [
 ]
 OPTIONS = ["Yes", "No", "Partially"]
 
+# ============================================
+# VOTE & SURVEY TIMELINE - RING BUFFERS
+# ============================================
+# Each resolution keeps a fixed number of buckets in a ring. A slot holds
+# (bucket_index, counts); a stale index means the slot is empty, so old
+# buckets are recycled in place and memory stays bounded. Counts are keyed
+# by str(candidate_id) for votes and 'survey' for surveys.
+#
+# Slots are never changed in place: the writer builds a new (idx, counts)
+# tuple and swaps it into the ring, so readers can walk the ring without
+# STATE_LOCK and each bucket they see is one the writer actually published.
+#
+# The timeline is saved to its own file every TIMELINE_SAVE_INTERVAL seconds
+# and at shutdown, not on every vote. The per-second ring is not saved at all.
+TIMELINE_FILE = 'voting_timeline.json'
+TIMELINE_SAVE_INTERVAL = 60
+TIMELINE_SAVED = ['minute', 'hour']
+TIMELINE_RESOLUTIONS = {
+    'second': (1, 3600),      # last hour
+    'minute': (60, 1440),     # last day
+    'hour': (3600, 720),      # last 30 days
+}
+TIMELINE = {res: [None] * size for res, (width, size) in TIMELINE_RESOLUTIONS.items()}
+
+def timeline_add(key, ts):
+    """Count one event in every resolution - call with STATE_LOCK held"""
+    for res, (width, size) in TIMELINE_RESOLUTIONS.items():
+        idx = int(ts // width)
+        ring = TIMELINE[res]
+        slot = ring[idx % size]
+        counts = dict(slot[1]) if slot is not None and slot[0] == idx else {}
+        counts[key] = counts.get(key, 0) + 1
+        ring[idx % size] = (idx, counts)
+
+def timeline_query(res, buckets, now=None):
+    """Per-bucket counts for the last `buckets` buckets, oldest first"""
+    width, size = TIMELINE_RESOLUTIONS[res]
+    buckets = max(1, min(buckets, size))
+    last = int((time.time() if now is None else now) // width)
+    ring = TIMELINE[res]
+    starts, rows = [], []
+    for idx in range(last - buckets + 1, last + 1):
+        slot = ring[idx % size]
+        starts.append(idx * width)
+        rows.append(slot[1] if slot is not None and slot[0] == idx else {})
+    return {
+        'resolution': res,
+        'bucket_seconds': width,
+        'timestamps': starts,
+        'votes': {name: [r.get(str(cid), 0) for r in rows] for cid, name in CANDIDATES.items()},
+        'surveys': [r.get('survey', 0) for r in rows],
+    }
+
+TIMELINE_SAVE_LOCK = threading.Lock()
+TIMELINE_SAVED_VERSION = [None]
+
+def save_timeline():
+    """Write the minute and hour rings to TIMELINE_FILE if anything changed"""
+    with TIMELINE_SAVE_LOCK:
+        with STATE_LOCK:
+            version = SNAPSHOT.version
+            if version == TIMELINE_SAVED_VERSION[0]:
+                return
+            rings = {res: list(TIMELINE[res]) for res in TIMELINE_SAVED}
+        data = {res: [list(slot) for slot in ring if slot is not None] for res, ring in rings.items()}
+        tmp = TIMELINE_FILE + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(data, f)
+        os.replace(tmp, TIMELINE_FILE)
+        TIMELINE_SAVED_VERSION[0] = version
+
+def timeline_saver():
+    while True:
+        time.sleep(TIMELINE_SAVE_INTERVAL)
+        try:
+            save_timeline()
+        except Exception as e:
+            print(f"⚠️ Could not save timeline: {e}")
+
+def load_timeline():
+    if os.path.exists(TIMELINE_FILE):
+        try:
+            with open(TIMELINE_FILE, 'r') as f:
+                data = json.load(f)
+                if isinstance(data, dict):
+                    return data
+        except:
+            pass
+    return {}
+
+def valid_slot(slot):
+    """A saved bucket is [index, {key: count}]"""
+    return (isinstance(slot, list) and len(slot) == 2
+            and type(slot[0]) is int and isinstance(slot[1], dict)
+            and all(isinstance(k, str) and type(v) is int for k, v in slot[1].items()))
+
+bad_slots = 0
+for res, slots in load_timeline().items():
+    if res in TIMELINE_SAVED:
+        if not isinstance(slots, list):
+            bad_slots += 1
+            continue
+        size = TIMELINE_RESOLUTIONS[res][1]
+        for slot in slots:
+            if not valid_slot(slot):
+                bad_slots += 1
+                continue
+            idx, counts = slot
+            TIMELINE[res][idx % size] = (idx, counts)
+if bad_slots:
+    print(f"⚠️ Skipping {bad_slots} malformed saved timeline bucket(s)")
+
+# ============================================
+# STATE SNAPSHOTS - ONE WRITER, LOCK-FREE READERS
+# ============================================
+# Writers mutate the live structures above only while holding STATE_LOCK,
+# then call publish(). Readers grab SNAPSHOT once and render from it; the
+# swap is a single reference assignment so they never see a half-done write.
+STATE_LOCK = threading.Lock()
+
+Snapshot = namedtuple('Snapshot', 'version vote_count total_votes survey_count answer_totals '
+                                   'question_totals cube')
+
+ANSWER_TOTALS = {o: 0 for o in OPTIONS}
+QUESTION_TOTALS = [{o: 0 for o in OPTIONS} for _ in SURVEY_QUESTIONS]
+
+# Cross-tab cube: CUBE[candidate][question][option] counts survey answers from
+# users who voted for that candidate. It is updated from whichever side arrives
+# second (vote or survey), so any slice is a lookup no matter how many respondents.
+# Only a user's latest survey counts: a resubmission replaces their earlier
+# answers, so each question's counts add up to the number of distinct respondents.
+CUBE = {cid: [{o: 0 for o in OPTIONS} for _ in SURVEY_QUESTIONS] for cid in CANDIDATES}
+USER_VOTES = {}     # user -> candidate ids they voted for
+USER_SURVEYS = {}   # user -> their latest survey responses
+
+def valid_survey(resp):
+    """A survey is one of OPTIONS for every question"""
+    return isinstance(resp, list) and len(resp) == len(SURVEY_QUESTIONS) and all(
+        isinstance(a, str) and a in OPTIONS for a in resp)
+
+def add_to_cube(cid, resp, delta=1):
+    for i, a in enumerate(resp):
+        CUBE[cid][i][a] += delta
+
+def record_survey(resp, user=None, ts=None):
+    """Fold one survey into the running answer totals (ts is None when replaying saved data)"""
+    if ts is not None:
+        timeline_add('survey', ts)
+    for i, a in enumerate(resp):
+        if a in ANSWER_TOTALS:
+            ANSWER_TOTALS[a] += 1
+            QUESTION_TOTALS[i][a] += 1
+    if user is not None:
+        old = USER_SURVEYS.get(user)
+        USER_SURVEYS[user] = resp
+        for cid in USER_VOTES.get(user, ()):
+            if old is not None:
+                add_to_cube(cid, old, -1)
+            add_to_cube(cid, resp)
+
+def record_vote(cid, user, ts):
+    """Fold one vote into the running vote aggregates"""
+    timeline_add(str(cid), ts)
+    VOTE_COUNT[cid] += 1
+    VOTERS[cid].append(user)
+    VOTER_SETS[cid].add(user)
+    USER_VOTES.setdefault(user, set()).add(cid)
+    if user in USER_SURVEYS:
+        add_to_cube(cid, USER_SURVEYS[user])
+
+for cid, users in VOTERS.items():
+    for u in users:
+        USER_VOTES.setdefault(u, set()).add(cid)
+bad = [i for i, r in enumerate(SURVEY_RESPONSES) if not valid_survey(r)]
+if bad:
+    print(f"⚠️ Skipping {len(bad)} malformed saved survey(s)")
+    for i in reversed(bad):
+        del SURVEY_RESPONSES[i]
+        del SURVEY_USERS[i]
+for r, u in zip(SURVEY_RESPONSES, SURVEY_USERS):
+    record_survey(r, u)
+
+SNAPSHOT = None
+
+def publish():
+    """Swap in a fresh immutable snapshot - call with STATE_LOCK held"""
+    global SNAPSHOT
+    SNAPSHOT = Snapshot(
+        version=SNAPSHOT.version + 1 if SNAPSHOT else 0,
+        vote_count=MappingProxyType(dict(VOTE_COUNT)),
+        total_votes=sum(VOTE_COUNT.values()),
+        survey_count=len(SURVEY_RESPONSES),
+        answer_totals=MappingProxyType(dict(ANSWER_TOTALS)),
+        question_totals=tuple(MappingProxyType(dict(t)) for t in QUESTION_TOTALS),
+        cube=MappingProxyType({cid: tuple(MappingProxyType(dict(t)) for t in qs) for cid, qs in CUBE.items()}),
+    )
+
+with STATE_LOCK:
+    publish()
+TIMELINE_SAVED_VERSION[0] = SNAPSHOT.version
+threading.Thread(target=timeline_saver, daemon=True).start()
+atexit.register(save_timeline)
+
+# ============================================
+# AI CHAT ENGINE
+# ============================================
+# Intents are compiled once at startup. Answers are cached per
+# (normalized question, snapshot version), so a repeated question costs a
+# dict lookup until the next vote or survey bumps the version. Trend answers
+# read the last hour of the timeline, which moves with the clock, so they
+# are rebuilt each time (a 60-bucket scan) instead of cached.
+TREND_WINDOW_MINUTES = 60
+CHAT_CACHE_SIZE = 1024
+CHAT_CACHE = {'version': -1, 'answers': {}}
+
+NORMALIZE_RE = re.compile(r"[^a-z0-9 ]+")
+TREND_RE = re.compile(r"\b(trend|trending|recent|recently|lately|momentum)\b")
+WINNER_RE = re.compile(r"\b(win|wins|winning|winner|lead|leads|leading|top|most popular)\b")
+RESULTS_RE = re.compile(r"\b(votes?|voted|voting|voters?|results?|count|counts|tally)\b")
+SURVEY_RE = re.compile(r"\b(survey|surveys|question|questions|answers?|say|said|think|feel|respon[a-z]*)\b")
+QUESTION_NUM_RE = re.compile(r"\b(?:question|q)\s*(10|[1-9])\b")
+VOTED_FOR_RE = re.compile(r"\b(?:voted for|voting for|voters of|voters for|supporters of|supported)\b")
+CANDIDATE_NUM_RE = re.compile(r"\b(?:option|candidate|priority|number)\s*([1-9])\b")
+
+CANDIDATE_RES = {
+    1: re.compile(r"\btransport"),
+    2: re.compile(r"\beducation"),
+    3: re.compile(r"\bassistive"),
+    4: re.compile(r"\bhealth"),
+    5: re.compile(r"\bdigital inclusion|\binclusion"),
+}
+QUESTION_RES = [
+    re.compile(r"\bschools?\b"),
+    re.compile(r"\b(workplaces?|accommodations?)\b"),
+    re.compile(r"\b(public transport|transport)\b"),
+    re.compile(r"\bassistive\b"),
+    re.compile(r"\bhealth"),
+    re.compile(r"\b(policy|represented)\b"),
+    re.compile(r"\bemergency\b"),
+    re.compile(r"\bdigital\b"),
+    re.compile(r"\b(voting (is )?(easy|hard|accessible)|easy to vote)\b"),
+    re.compile(r"\blaws?\b"),
+]
+
+def normalize_question(question):
+    return " ".join(NORMALIZE_RE.sub(" ", question.lower()).split())
+
+def pct(n, total):
+    return (n/total)*100 if total > 0 else 0
+
+def crosstab_cell(snap, cid, i):
+    """How voters for one candidate answered one survey question"""
+    counts = snap.cube[cid][i]
+    total = sum(counts.values())
+    return {
+        'candidate': CANDIDATES[cid],
+        'question': SURVEY_QUESTIONS[i],
+        'respondents': total,
+        'counts': dict(counts),
+        'percent': {o: round(pct(counts[o], total), 1) for o in OPTIONS},
+    }
+
+def find_candidate(q):
+    m = CANDIDATE_NUM_RE.search(q)
+    if m and int(m.group(1)) in CANDIDATES:
+        return int(m.group(1))
+    for cid, rx in CANDIDATE_RES.items():
+        if rx.search(q):
+            return cid
+    return None
+
+def match_question(q):
+    """(question index, match) for the first survey question q mentions, else (None, None)"""
+    m = QUESTION_NUM_RE.search(q)
+    if m:
+        return int(m.group(1)) - 1, m
+    for i, rx in enumerate(QUESTION_RES):
+        m = rx.search(q)
+        if m:
+            return i, m
+    return None, None
+
+def find_question(q):
+    return match_question(q)[0]
+
+def results_answer(snap):
+    total = snap.total_votes
+    if total == 0:
+        return "📊 No votes yet!"
+    winner = max(snap.vote_count, key=snap.vote_count.get)
+    resp = f"🏆 Leading: {CANDIDATES[winner]} ({snap.vote_count[winner]} votes)\n\n"
+    for cid, name in CANDIDATES.items():
+        v = snap.vote_count[cid]
+        resp += f"• {name}: {v} votes ({pct(v, total):.1f}%)\n"
+    return resp
+
+def winner_answer(snap):
+    if snap.total_votes == 0:
+        return "📊 No votes yet!"
+    top = max(snap.vote_count.values())
+    leaders = [CANDIDATES[c] for c, v in snap.vote_count.items() if v == top]
+    if len(leaders) > 1:
+        return f"🤝 Tied for the lead with {top} votes each: {', '.join(leaders)}"
+    return f"🏆 {leaders[0]} is leading with {top} of {snap.total_votes} votes ({pct(top, snap.total_votes):.1f}%)"
+
+def candidate_answer(snap, cid):
+    v = snap.vote_count[cid]
+    return f"🗳️ {CANDIDATES[cid]}: {v} votes ({pct(v, snap.total_votes):.1f}% of {snap.total_votes})"
+
+def question_answer(snap, i):
+    counts = snap.question_totals[i]
+    total = sum(counts.values())
+    resp = f"📋 Q{i+1}. {SURVEY_QUESTIONS[i]}\n\n"
+    if total == 0:
+        return resp + "No answers yet."
+    for o in OPTIONS:
+        resp += f"• {o}: {counts[o]} ({pct(counts[o], total):.1f}%)\n"
+    return resp
+
+def survey_answer(snap):
+    ts = snap.survey_count
+    if ts == 0:
+        return "📋 No surveys yet!"
+    t = sum(snap.answer_totals.values())
+    resp = f"📋 Survey responses: {ts}\n\n"
+    for o in OPTIONS:
+        n = snap.answer_totals[o]
+        resp += f"• {o}: {n} ({pct(n, t):.1f}%)\n"
+    return resp
+
+def trend_answer(snap):
+    if snap.total_votes == 0:
+        return "📈 No votes yet!"
+    window = timeline_query('minute', TREND_WINDOW_MINUTES)['votes']
+    counts = {cid: sum(window[name]) for cid, name in CANDIDATES.items()}
+    recent = sum(counts.values())
+    if recent == 0:
+        winner = max(snap.vote_count, key=snap.vote_count.get)
+        return (f"📈 No votes in the last hour. Overall, {CANDIDATES[winner]} leads with "
+                f"{snap.vote_count[winner]} of {snap.total_votes} votes.")
+    hot = max(counts, key=counts.get)
+    resp = f"📈 Last hour: {recent} votes, {CANDIDATES[hot]} is gaining most ({counts[hot]})\n\n"
+    for cid, name in CANDIDATES.items():
+        overall = pct(snap.vote_count[cid], snap.total_votes)
+        resp += f"• {name}: {pct(counts[cid], recent):.1f}% in the last hour vs {overall:.1f}% overall\n"
+    return resp
+
+def crosstab_answer(snap, cid, i):
+    cell = crosstab_cell(snap, cid, i)
+    resp = f"🔗 Among {CANDIDATES[cid]} voters - Q{i+1}. {SURVEY_QUESTIONS[i]}\n\n"
+    if cell['respondents'] == 0:
+        return resp + "No survey answers from these voters yet."
+    for o in OPTIONS:
+        resp += f"• {o}: {cell['counts'][o]} ({cell['percent'][o]:.1f}%)\n"
+    return resp
+
+def find_crosstab(q):
+    """(candidate, question) for questions like 'among people who voted for X, what did they say about Y'"""
+    m = VOTED_FOR_RE.search(q)
+    if not m:
+        return None
+    rest = q[m.end():]
+    hits = [(rx.search(rest), cid) for cid, rx in CANDIDATE_RES.items()]
+    hits = [(h.start(), h.end(), cid) for h, cid in hits if h]
+    if not hits:
+        return None
+    start, end, cid = min(hits)
+    i = find_question(q[:m.start()] + " " + rest[:start] + " " + rest[end:])
+    return None if i is None else (cid, i)
+
+def build_answer(q, snap):
+    """Route a normalized question to the matching intent"""
+    ct = find_crosstab(q)
+    if ct:
+        return crosstab_answer(snap, *ct)
+    if TREND_RE.search(q):
+        return trend_answer(snap)
+    if SURVEY_RE.search(q) or QUESTION_NUM_RE.search(q):
+        i = find_question(q)
+        return survey_answer(snap) if i is None else question_answer(snap, i)
+    # Some topics are both a priority and a survey question (transport,
+    # assistive technology, health, digital). Without vote words, answer the survey question.
+    cid = find_candidate(q)
+    i, m = match_question(q)
+    rest = q if m is None else q[:m.start()] + " " + q[m.end():]
+    asks_votes = RESULTS_RE.search(rest) or WINNER_RE.search(rest) or CANDIDATE_NUM_RE.search(rest)
+    if cid is not None and (i is None or asks_votes):
+        return candidate_answer(snap, cid)
+    if i is not None and not asks_votes:
+        return question_answer(snap, i)
+    if WINNER_RE.search(q):
+        return winner_answer(snap)
+    if RESULTS_RE.search(q):
+        return results_answer(snap)
+    return ("Ask about voting results, who is winning, a priority (e.g. 'votes for transport'), "
+            "survey questions (e.g. 'question 3'), recent trends, or how voters answered "
+            "(e.g. 'voted for transport, question 3')!")
+
 def get_response(question):
     """AI chatbot responses"""
-    q = question.lower()
-    if any(w in q for w in ['vote', 'result', 'winning']):
-        total = sum(VOTE_COUNT.values())
-        if total == 0:
-            return "📊 No votes yet!"
-        winner = max(VOTE_COUNT, key=VOTE_COUNT.get)
-        resp = f"🏆 Leading: {CANDIDATES[winner]} ({VOTE_COUNT[winner]} votes)\n\n"
-        for cid, name in CANDIDATES.items():
-            v = VOTE_COUNT[cid]
-            pct = (v/total)*100 if total > 0 else 0
-            resp += f"• {name}: {v} votes ({pct:.1f}%)\n"
-        return resp
-    if 'survey' in q:
-        return f"📋 Survey responses: {len(SURVEY_RESPONSES)}"
-    return "Ask about voting results or surveys!"
+    global CHAT_CACHE
+    snap = SNAPSHOT
+    q = normalize_question(question)
+    if TREND_RE.search(q):
+        return build_answer(q, snap)
+    cache = CHAT_CACHE
+    if cache['version'] < snap.version:
+        cache = CHAT_CACHE = {'version': snap.version, 'answers': {}}
+    elif cache['version'] > snap.version:
+        return build_answer(q, snap)
+    answer = cache['answers'].get(q)
+    if answer is None:
+        answer = build_answer(q, snap)
+        if len(cache['answers']) < CHAT_CACHE_SIZE:
+            cache['answers'][q] = answer
+    return answer
 
 # ============================================
 # ACCESSIBILITY TOOLBAR - ON ALL PAGES
@@ -184,9 +598,11 @@ function voiceVote(){
 # ============================================
 # PAGE VIEWS
 # ============================================
+# Pages without live data are rendered to bytes once at import, so requests
+# (and every `serve` thread) just hand out the same buffer.
 
-def welcome(request):
-    return HttpResponse("""
+def render_welcome():
+    return ("""
 <!DOCTYPE html>
 <html>
 <head>
@@ -226,6 +642,11 @@ body{font-family:'Segoe UI',sans-serif;background:linear-gradient(135deg,#0a66c2
 </html>
     """)
 
+WELCOME_PAGE = render_welcome().encode()
+
+def welcome(request):
+    return HttpResponse(WELCOME_PAGE)
+
 @csrf_exempt
 def login(request):
     global CURRENT_USER
@@ -235,11 +656,15 @@ def login(request):
         if len(u) >= 4 and len(p) >= 4:
             CURRENT_USER = u
             token = str(uuid.uuid4())
-            VALID_TOKENS[token] = u
-            save_data()
+            with STATE_LOCK:
+                VALID_TOKENS[token] = u
+                save_data()
             return HttpResponse(f"<script>localStorage.setItem('auth_token','{token}');window.location.href='/app/';</script>")
     
-    return HttpResponse("""
+    return HttpResponse(LOGIN_PAGE)
+
+def render_login():
+    return ("""
 <!DOCTYPE html>
 <html>
 <head>
@@ -275,9 +700,12 @@ body{font-family:'Segoe UI',sans-serif;background:linear-gradient(135deg,#0a66c2
 </html>
     """)
 
+LOGIN_PAGE = render_login().encode()
+
 def dashboard(request):
-    tv = sum(VOTE_COUNT.values())
-    ts = len(SURVEY_RESPONSES)
+    snap = SNAPSHOT
+    tv = snap.total_votes
+    ts = snap.survey_count
     return HttpResponse(f"""
 <!DOCTYPE html>
 <html>
@@ -337,9 +765,9 @@ body{{font-family:'Segoe UI',sans-serif;background:linear-gradient(135deg,#0a66c
 </html>
     """)
 
-def vote_page(request):
+def render_vote_page():
     cards = "".join([f"<div class='card' onclick='submitVote({c})'><h3>{CANDIDATES[c]}</h3><p>Click to vote</p></div>" for c in CANDIDATES])
-    return HttpResponse(f"""
+    return (f"""
 <!DOCTYPE html>
 <html>
 <head>
@@ -388,7 +816,12 @@ else alert('❌ '+d.message);
 </html>
     """)
 
-def survey_page(request):
+VOTE_PAGE = render_vote_page().encode()
+
+def vote_page(request):
+    return HttpResponse(VOTE_PAGE)
+
+def render_survey_page():
     qs = ""
     for i in range(len(SURVEY_QUESTIONS)):
         qs += f"""
@@ -405,7 +838,7 @@ def survey_page(request):
         </div>
         """
     
-    return HttpResponse(f"""
+    return (f"""
 <!DOCTYPE html>
 <html>
 <head>
@@ -563,14 +996,20 @@ window.addEventListener('DOMContentLoaded', function() {{
 </html>
     """)
 
+SURVEY_PAGE = render_survey_page().encode()
+
+def survey_page(request):
+    return HttpResponse(SURVEY_PAGE)
+
 def results_page(request):
-    tv = sum(VOTE_COUNT.values())
-    ts = len(SURVEY_RESPONSES)
+    snap = SNAPSHOT
+    tv = snap.total_votes
+    ts = snap.survey_count
     
     rh = "<h3>🗳️ Voting Results</h3>"
     if tv > 0:
         for c, n in CANDIDATES.items():
-            v = VOTE_COUNT[c]
+            v = snap.vote_count[c]
             p = (v/tv)*100
             rh += f"<div style='margin:1rem 0'><div style='display:flex;justify-content:space-between;margin-bottom:0.5rem'><b>{n}</b><span>{v} votes ({p:.1f}%)</span></div><div style='background:#e2e8f0;height:30px;border-radius:8px;overflow:hidden'><div style='width:{p}%;background:linear-gradient(135deg,#0a66c2,#004182);height:100%'></div></div></div>"
     else:
@@ -578,9 +1017,9 @@ def results_page(request):
     
     rh += "<h3 style='margin-top:2rem'>📋 Survey Stats</h3>"
     if ts > 0:
-        ay = sum(1 for r in SURVEY_RESPONSES for a in r if a=='Yes')
-        an = sum(1 for r in SURVEY_RESPONSES for a in r if a=='No')
-        ap = sum(1 for r in SURVEY_RESPONSES for a in r if a=='Partially')
+        ay = snap.answer_totals['Yes']
+        an = snap.answer_totals['No']
+        ap = snap.answer_totals['Partially']
         t = ay+an+ap
         if t > 0:
             rh += f"<p style='margin:1rem 0'>✅ Yes: {ay} ({(ay/t)*100:.1f}%) | ❌ No: {an} ({(an/t)*100:.1f}%) | ⚠️ Partially: {ap} ({(ap/t)*100:.1f}%)</p>"
@@ -621,8 +1060,8 @@ h3{{color:#0a66c2;margin:1rem 0 0.5rem 0;font-size:1.2rem}}
 </html>
     """)
 
-def chat_page(request):
-    return HttpResponse("""
+def render_chat_page():
+    return ("""
 <!DOCTYPE html>
 <html>
 <head>
@@ -681,7 +1120,9 @@ function q(t){document.getElementById('i').value=t;send();}
 </div>
 <div>
 <button class="btn btn-sec" onclick="q('What are the voting results?')">📊 Results</button>
+<button class="btn btn-sec" onclick="q('Who is winning?')">🏆 Winner</button>
 <button class="btn btn-sec" onclick="q('Show survey statistics')">📋 Survey</button>
+<button class="btn btn-sec" onclick="q('What are the recent trends?')">📈 Trends</button>
 <button class="btn btn-sec" onclick="q('help')">❓ Help</button>
 </div>
 </div>
@@ -689,20 +1130,111 @@ function q(t){document.getElementById('i').value=t;send();}
 </html>
     """)
 
-def serve_image(request):
-    """Serve collage image"""
+CHAT_PAGE = render_chat_page().encode()
+
+def chat_page(request):
+    return HttpResponse(CHAT_PAGE)
+
+def load_image():
     path = os.path.join(os.path.dirname(__file__), 'accessibility-collage.jpg')
     try:
         with open(path, 'rb') as f:
-            return HttpResponse(f.read(), content_type='image/jpeg')
+            return f.read()
     except:
+        return None
+
+COLLAGE_IMAGE = load_image()
+
+def serve_image(request):
+    """Serve collage image"""
+    if COLLAGE_IMAGE is None:
         return HttpResponse("Image not found", status=404)
+    return HttpResponse(COLLAGE_IMAGE, content_type='image/jpeg')
+
+# ============================================
+# IDEMPOTENCY KEYS - SAFE CLIENT RETRIES
+# ============================================
+# A POST carrying an Idempotency-Key header is answered once; retries with the
+# same key (from the same token, to the same endpoint) replay the stored
+# response without re-running the view. A retry whose body differs from the
+# original gets 422. Entries live in a bounded LRU and expire after
+# IDEMPOTENCY_TTL seconds. A retry that arrives while the first request is
+# still running waits for it instead of writing twice.
+IDEMPOTENCY_TTL = 24 * 3600
+IDEMPOTENCY_MAX = 10000
+IDEMPOTENCY_WAIT = 30
+IDEMPOTENCY_PURGE_INTERVAL = 60
+# status/content are None while the first request is still running
+IdempotencyEntry = namedtuple('IdempotencyEntry', 'digest event expires status content')
+IDEMPOTENCY_CACHE = OrderedDict()
+IDEMPOTENCY_LOCK = threading.Lock()
+IDEMPOTENCY_PURGED = [0.0]
+
+def evict_idempotency():
+    """Drop expired entries (at most once a minute), then least recently used
+    finished ones until under IDEMPOTENCY_MAX - call with IDEMPOTENCY_LOCK held"""
+    now = time.time()
+    if now - IDEMPOTENCY_PURGED[0] > IDEMPOTENCY_PURGE_INTERVAL:
+        IDEMPOTENCY_PURGED[0] = now
+        for k in [k for k, e in IDEMPOTENCY_CACHE.items() if e.status is not None and e.expires < now]:
+            del IDEMPOTENCY_CACHE[k]
+    excess = len(IDEMPOTENCY_CACHE) - IDEMPOTENCY_MAX
+    if excess > 0:
+        victims = islice((k for k, e in IDEMPOTENCY_CACHE.items() if e.status is not None), excess)
+        for k in list(victims):
+            del IDEMPOTENCY_CACHE[k]
+
+def idempotent(view):
+    @wraps(view)
+    def wrapper(request):
+        key = request.META.get('HTTP_IDEMPOTENCY_KEY', '').strip()
+        if request.method != 'POST' or not key:
+            return view(request)
+        if len(key) > 255:
+            return JsonResponse({'success': False, 'message': 'Idempotency-Key too long'}, status=400)
+        
+        ck = (request.path, request.META.get('HTTP_AUTHORIZATION', ''), key)
+        digest = hashlib.sha256(request.body).hexdigest()
+        while True:
+            with IDEMPOTENCY_LOCK:
+                entry = IDEMPOTENCY_CACHE.get(ck)
+                if entry is None or (entry.status is not None and entry.expires < time.time()):
+                    running = threading.Event()
+                    IDEMPOTENCY_CACHE[ck] = IdempotencyEntry(digest, running, None, None, None)
+                    IDEMPOTENCY_CACHE.move_to_end(ck)
+                    evict_idempotency()
+                    break
+                if entry.digest != digest:
+                    return JsonResponse({'success': False, 'message': 'Idempotency-Key was already used with a different request'}, status=422)
+                if entry.status is not None:
+                    IDEMPOTENCY_CACHE.move_to_end(ck)
+                    resp = HttpResponse(entry.content, status=entry.status, content_type='application/json')
+                    resp['Idempotent-Replayed'] = 'true'
+                    return resp
+            if not entry.event.wait(IDEMPOTENCY_WAIT):
+                return JsonResponse({'success': False, 'message': 'Original request still in progress'}, status=409)
+        
+        resp = None
+        try:
+            resp = view(request)
+        finally:
+            with IDEMPOTENCY_LOCK:
+                if resp is not None and resp.status_code < 500:
+                    IDEMPOTENCY_CACHE[ck] = IdempotencyEntry(digest, running, time.time() + IDEMPOTENCY_TTL,
+                                                             resp.status_code, resp.content)
+                    evict_idempotency()
+                else:
+                    IDEMPOTENCY_CACHE.pop(ck, None)
+            running.set()
+        return resp
+    return wrapper
 
 # ============================================
 # API ENDPOINTS
 # ============================================
 
 @csrf_exempt
+@idempotent
 def api_vote(request):
     if request.method != 'POST':
         return JsonResponse({'success': False, 'message': 'Only POST'}, status=405)
@@ -719,18 +1251,20 @@ def api_vote(request):
             return JsonResponse({'success': False, 'message': 'Invalid candidate'}, status=400)
         
         user = VALID_TOKENS[auth]
-        if user in VOTERS[cid]:
-            return JsonResponse({'success': False, 'message': 'Already voted'}, status=400)
-        
-        VOTE_COUNT[cid] += 1
-        VOTERS[cid].append(user)
-        save_data()
+        with STATE_LOCK:
+            if user in VOTER_SETS[cid]:
+                return JsonResponse({'success': False, 'message': 'Already voted'}, status=400)
+            
+            record_vote(cid, user, time.time())
+            save_data()
+            publish()
         
         return JsonResponse({'success': True, 'message': f'Voted for {CANDIDATES[cid]}'})
     except Exception as e:
         return JsonResponse({'success': False, 'message': str(e)}, status=500)
 
 @csrf_exempt
+@idempotent
 def api_survey(request):
     if request.method != 'POST':
         return JsonResponse({'success': False, 'message': 'Only POST'}, status=405)
@@ -743,16 +1277,56 @@ def api_survey(request):
         data = json.loads(request.body)
         resp = data.get('responses', [])
         
-        if len(resp) != len(SURVEY_QUESTIONS):
+        if not isinstance(resp, list) or len(resp) != len(SURVEY_QUESTIONS):
             return JsonResponse({'success': False, 'message': 'Need all answers'}, status=400)
+        if not valid_survey(resp):
+            return JsonResponse({'success': False, 'message': f"Answers must be one of {', '.join(OPTIONS)}"}, status=400)
         
-        SURVEY_RESPONSES.append(resp)
-        save_data()
+        user = VALID_TOKENS[auth]
+        with STATE_LOCK:
+            record_survey(resp, user, time.time())
+            SURVEY_RESPONSES.append(resp)
+            SURVEY_USERS.append(user)
+            save_data()
+            publish()
         
         return JsonResponse({'success': True, 'message': 'Survey saved'})
     except Exception as e:
         return JsonResponse({'success': False, 'message': str(e)}, status=500)
 
+def api_crosstab(request):
+    if request.method != 'GET':
+        return JsonResponse({'success': False, 'message': 'Only GET'}, status=405)
+    
+    try:
+        cid = int(request.GET['candidate']) if request.GET.get('candidate') else None
+        qn = int(request.GET['question']) if request.GET.get('question') else None
+    except ValueError:
+        return JsonResponse({'success': False, 'message': 'candidate and question must be numbers'}, status=400)
+    if cid is not None and cid not in CANDIDATES:
+        return JsonResponse({'success': False, 'message': 'Invalid candidate'}, status=400)
+    if qn is not None and not 1 <= qn <= len(SURVEY_QUESTIONS):
+        return JsonResponse({'success': False, 'message': 'Invalid question'}, status=400)
+    
+    snap = SNAPSHOT
+    cids = [cid] if cid is not None else list(CANDIDATES)
+    qs = [qn - 1] if qn is not None else range(len(SURVEY_QUESTIONS))
+    return JsonResponse({'success': True, 'cells': [crosstab_cell(snap, c, i) for c in cids for i in qs]})
+
+def api_timeline(request):
+    if request.method != 'GET':
+        return JsonResponse({'success': False, 'message': 'Only GET'}, status=405)
+    
+    res = request.GET.get('resolution', 'minute')
+    if res not in TIMELINE_RESOLUTIONS:
+        return JsonResponse({'success': False, 'message': f"resolution must be one of {', '.join(TIMELINE_RESOLUTIONS)}"}, status=400)
+    try:
+        buckets = int(request.GET.get('buckets', 60))
+    except ValueError:
+        return JsonResponse({'success': False, 'message': 'buckets must be a number'}, status=400)
+    
+    return JsonResponse({'success': True, **timeline_query(res, buckets)})
+
 @csrf_exempt
 def api_chat(request):
     if request.method != 'POST':
@@ -785,11 +1359,289 @@ urlpatterns = [
     path('api/vote/', api_vote),
     path('api/survey/submit/', api_survey),
     path('api/chat/', api_chat),
+    path('api/timeline/', api_timeline),
+    path('api/crosstab/', api_crosstab),
 ]
 
 application = get_wsgi_application()
 
+# ============================================
+# PRODUCTION SERVER - `python accessible_voting_system.py serve`
+# ============================================
+# One process, a fixed pool of threads and HTTP/1.1 keep-alive. All votes
+# live in this process's memory, so we scale with threads (readers never
+# lock, see STATE SNAPSHOTS) rather than forking workers that would each
+# hold their own copy of the data.
+#
+# Each open connection holds one pool thread, so --threads caps concurrent
+# connections, not just concurrent requests. To keep idle keep-alive clients
+# from starving others, a connection is closed after KEEPALIVE_MAX_REQUESTS
+# requests, or as soon as it is idle while another connection is queued.
+# Once MAX_QUEUED_PER_THREAD * threads connections are queued, new ones get 503.
+#
+# SIGHUP reloads gracefully: stop accepting, let in-flight requests finish,
+# flush save_data() under STATE_LOCK, then re-exec on the same listening
+# socket so queued connections are picked up by the new process.
+# SIGTERM / Ctrl+C do the same drain and flush, then exit.
+LISTEN_FD_ENV = 'VOTING_LISTEN_FD'
+KEEPALIVE_MAX_REQUESTS = 100
+MAX_QUEUED_PER_THREAD = 8
+BUSY_RESPONSE = b"HTTP/1.1 503 Service Unavailable\r\nContent-Length: 0\r\nRetry-After: 1\r\nConnection: close\r\n\r\n"
+MAX_REQUEST_BODY = 1024 * 1024
+CHUNK_SIZE_RE = re.compile(rb"[0-9a-fA-F]{1,16}")
+
+class WSGIRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def setup(self):
+        self.timeout = self.server.keepalive
+        self.served = 0
+        super().setup()
+
+    def handle(self):
+        self.close_connection = False
+        while not self.close_connection and self.wait_for_request():
+            self.handle_one_request()
+            self.served += 1
+
+    def wait_for_request(self):
+        """Idle until the client sends something; give the thread back early
+        if other connections are queued, the server is stopping, or the
+        connection has served its quota"""
+        if self.served >= KEEPALIVE_MAX_REQUESTS:
+            return False
+        # Bytes already in rfile's buffer (pipelining) never show up in select()
+        self.connection.setblocking(False)
+        try:
+            if self.rfile.peek(1):
+                return True
+        finally:
+            self.connection.settimeout(self.server.keepalive)
+        deadline = time.monotonic() + self.server.keepalive
+        while not self.server.stopping and not (self.served and self.server.waiting):
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            if select.select([self.connection], [], [], min(remaining, 0.25))[0]:
+                return True
+        return False
+
+    def closing(self):
+        return (self.server.stopping or self.server.waiting
+                or self.served + 1 >= KEEPALIVE_MAX_REQUESTS)
+
+    def handle_one_request(self):
+        try:
+            self.raw_requestline = self.rfile.readline(65537)
+        except (socket.timeout, ConnectionError):
+            self.close_connection = True
+            return
+        if not self.raw_requestline or len(self.raw_requestline) > 65536:
+            self.close_connection = True
+            return
+        if not self.parse_request():
+            return
+        try:
+            body = self.read_body()
+        except (socket.timeout, ConnectionError):
+            self.close_connection = True
+            return
+        if body is None:
+            return
+        self.run_wsgi(body)
+
+    def read_body(self):
+        """Request body bytes, or None once an error reply has been sent"""
+        te = self.headers.get('Transfer-Encoding')
+        if te is not None:
+            if te.strip().lower() != 'chunked':
+                self.send_error(501, 'Unsupported Transfer-Encoding')
+                return None
+            return self.read_chunked()
+
+        lengths = {v.strip() for v in self.headers.get_all('Content-Length') or ['0']}
+        length = lengths.pop()
+        if lengths or not (length.isascii() and length.isdigit()):
+            self.send_error(400, 'Bad Content-Length')
+            return None
+        length = int(length)
+        if length > MAX_REQUEST_BODY:
+            self.send_error(413, 'Request body too large')
+            return None
+        body = self.rfile.read(length)
+        if len(body) != length:
+            self.close_connection = True
+            return None
+        return body
+
+    def read_chunked(self):
+        body = b''
+        while True:
+            size = self.rfile.readline(65537).split(b';', 1)[0].strip()
+            if not CHUNK_SIZE_RE.fullmatch(size):
+                self.send_error(400, 'Bad chunked body')
+                return None
+            size = int(size, 16)
+            if size == 0:
+                break
+            if len(body) + size > MAX_REQUEST_BODY:
+                self.send_error(413, 'Request body too large')
+                return None
+            chunk = self.rfile.read(size)
+            if len(chunk) != size or self.rfile.readline(65537).strip():
+                self.send_error(400, 'Bad chunked body')
+                return None
+            body += chunk
+        while self.rfile.readline(65537).strip():   # skip trailers
+            pass
+        return body
+
+    def run_wsgi(self, body):
+        path, _, query = self.path.partition('?')
+        host, port = self.server.server_address[:2]
+        environ = {
+            'REQUEST_METHOD': self.command,
+            'SCRIPT_NAME': '',
+            'PATH_INFO': unquote(path, encoding='latin-1'),
+            'QUERY_STRING': query,
+            'CONTENT_TYPE': self.headers.get('Content-Type', ''),
+            'CONTENT_LENGTH': str(len(body)) if body else '',
+            'SERVER_NAME': str(host),
+            'SERVER_PORT': str(port),
+            'SERVER_PROTOCOL': self.request_version,
+            'REMOTE_ADDR': self.client_address[0],
+            'wsgi.version': (1, 0),
+            'wsgi.url_scheme': 'http',
+            'wsgi.input': io.BytesIO(body),
+            'wsgi.errors': sys.stderr,
+            'wsgi.multithread': True,
+            'wsgi.multiprocess': False,
+            'wsgi.run_once': False,
+        }
+        for k, v in self.headers.items():
+            k = 'HTTP_' + k.upper().replace('-', '_')
+            if k not in ('HTTP_CONTENT_TYPE', 'HTTP_CONTENT_LENGTH', 'HTTP_TRANSFER_ENCODING'):
+                environ[k] = environ[k] + ',' + v if k in environ else v
+
+        started = []
+        def start_response(status, headers, exc_info=None):
+            started[:] = [status, headers]
+
+        result = self.server.app(environ, start_response)
+        try:
+            out = b''.join(result)
+        finally:
+            if hasattr(result, 'close'):
+                result.close()
+
+        status, headers = started
+        code, _, reason = status.partition(' ')
+        self.send_response(int(code), reason)
+        for k, v in headers:
+            if k.lower() != 'content-length':
+                self.send_header(k, v)
+        self.send_header('Content-Length', str(len(out)))
+        if self.closing():
+            self.send_header('Connection', 'close')
+        self.end_headers()
+        if self.command != 'HEAD':
+            self.wfile.write(out)
+        self.wfile.flush()
+
+class PooledWSGIServer(HTTPServer):
+    """HTTPServer that hands each connection to a fixed thread pool"""
+    request_queue_size = socket.SOMAXCONN
+
+    def __init__(self, address, app, threads, keepalive, listen_fd=None):
+        self.app = app
+        self.keepalive = keepalive
+        self.stopping = False
+        self.waiting = 0
+        self.max_waiting = threads * MAX_QUEUED_PER_THREAD
+        self.waiting_lock = threading.Lock()
+        self.pool = ThreadPoolExecutor(max_workers=threads)
+        super().__init__(address, WSGIRequestHandler, bind_and_activate=listen_fd is None)
+        if listen_fd is not None:
+            self.socket.close()
+            self.socket = socket.socket(fileno=listen_fd)
+            self.server_address = self.socket.getsockname()
+
+    def process_request(self, request, client_address):
+        with self.waiting_lock:
+            full = self.waiting >= self.max_waiting
+            if not full:
+                self.waiting += 1
+        if full:
+            try:
+                request.sendall(BUSY_RESPONSE)
+            except OSError:
+                pass
+            self.shutdown_request(request)
+            return
+        self.pool.submit(self.process_request_thread, request, client_address)
+
+    def process_request_thread(self, request, client_address):
+        with self.waiting_lock:
+            self.waiting -= 1
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+    def drain(self):
+        """Stop taking new requests, wait for in-flight ones, then flush data"""
+        self.stopping = True
+        self.pool.shutdown(wait=True)
+        with STATE_LOCK:
+            save_data()
+        save_timeline()
+
+def serve(argv):
+    parser = argparse.ArgumentParser(prog='accessible_voting_system.py serve',
+                                     description='Run the app on the built-in threaded keep-alive server')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--threads', type=int, default=32, help='max concurrent connections; each keep-alive connection holds a thread (default 32)')
+    parser.add_argument('--keepalive', type=float, default=5, help='idle keep-alive timeout in seconds (default 5)')
+    args = parser.parse_args(argv)
+
+    fd = os.environ.pop(LISTEN_FD_ENV, None)
+    server = PooledWSGIServer((args.host, args.port), application, args.threads, args.keepalive,
+                              listen_fd=int(fd) if fd else None)
+    reload = []
+
+    def stop(signum, frame):
+        if signum == getattr(signal, 'SIGHUP', None):
+            reload.append(True)
+        server.stopping = True
+        threading.Thread(target=server.shutdown).start()
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    if hasattr(signal, 'SIGHUP'):
+        signal.signal(signal.SIGHUP, stop)
+
+    host, port = server.server_address[:2]
+    print(f"🚀 Serving on http://{host}:{port}/ ({args.threads} threads, pid {os.getpid()}) - SIGHUP reloads, Ctrl+C stops")
+    server.serve_forever()
+
+    print("⏳ Draining in-flight requests...")
+    server.drain()
+    if reload:
+        print("🔄 Reloading...")
+        listen_fd = server.socket.fileno()
+        os.set_inheritable(listen_fd, True)
+        os.environ[LISTEN_FD_ENV] = str(listen_fd)
+        os.execv(sys.executable, [sys.executable, os.path.abspath(__file__), 'serve'] + argv)
+    server.server_close()
+    print("👋 Stopped")
+
 if __name__ == '__main__':
-    if len(sys.argv) == 1:
-        sys.argv.append('runserver')
-    execute_from_command_line(sys.argv)
+    if len(sys.argv) > 1 and sys.argv[1] == 'serve':
+        serve(sys.argv[2:])
+    else:
+        if len(sys.argv) == 1:
+            sys.argv.append('runserver')
+        execute_from_command_line(sys.argv)